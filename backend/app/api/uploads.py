@@ -2,21 +2,26 @@ import os
 import uuid
 import io
 import tempfile
+from contextlib import nullcontext
 from typing import List
 from fastapi import APIRouter, UploadFile, File, Query, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
 from app.models.project import Project, ARoll, BRoll
 from app.utils.storage import BUCKET_OUTPUTS, client, BUCKET_A_ROLL, BUCKET_B_ROLL
+from app.services.renderer import playlist_media_files
 from app.utils.video import get_video_duration
-from app.workers.background import run_broll_analysis, run_matching_logic, run_transcription_pipeline, run_video_render 
+from app.utils.metrics import span, observe_transfer
+from app.workers.background import run_broll_analysis, run_matching_logic, run_transcription_pipeline, run_video_render, cancel_render
+from app.workers import pipeline
 
 router = APIRouter()
 
 # initializes a new project and returns a unique short id
+# auto_pipeline projects advance on their own: each stage starts as soon as its inputs exist
 @router.post("/create-project")
-async def create_project(name: str):
+async def create_project(name: str, auto_pipeline: bool = False):
     project_id = str(uuid.uuid4().hex[:6]).upper()
-    new_project = Project(project_id=project_id, name=name)
+    new_project = Project(project_id=project_id, name=name, auto_pipeline=auto_pipeline)
     await new_project.insert()
     return {"project_id": project_id}
 
@@ -41,22 +46,30 @@ async def upload_a_roll(
             tmp.write(file_data)
             tmp_path = tmp.name
         
-        duration = get_video_duration(tmp_path)
+        with span("upload", "probe"):
+            duration = await get_video_duration(tmp_path)
         os.remove(tmp_path)
 
-        client.put_object(
-            BUCKET_A_ROLL, 
-            file_id, 
-            io.BytesIO(file_data), 
-            length=len(file_data),
-            content_type=file.content_type
-        )
+        with span("upload", "store"):
+            client.put_object(
+                BUCKET_A_ROLL, 
+                file_id, 
+                io.BytesIO(file_data), 
+                length=len(file_data),
+                content_type=file.content_type
+            )
+        observe_transfer("upload", BUCKET_A_ROLL, len(file_data))
 
-        project.a_roll = ARoll(file_id=file_id, path=file_id, duration=duration)
-        project.status = "TRANSCRIBING"
-        await project.save()
+        # atomic $set so b-roll work running in parallel isn't overwritten
+        await project.set({
+            "a_roll": ARoll(file_id=file_id, path=file_id, duration=duration).model_dump(),
+            "status": "TRANSCRIBING"
+        })
 
-        background_tasks.add_task(run_transcription_pipeline, project_id)
+        if project.auto_pipeline:
+            await pipeline.advance(project_id)
+        else:
+            background_tasks.add_task(run_transcription_pipeline, project_id)
 
         return {
             "file_id": file_id, 
@@ -77,37 +90,47 @@ async def upload_multiple_b_rolls(
         raise HTTPException(status_code=404, detail="project not found")
 
     uploaded_ids = []
-    
-    for file in files:
-        file_ext = os.path.splitext(file.filename)[1]
-        broll_id = f"broll_{uuid.uuid4().hex[:8]}{file_ext}"
+    # in auto mode the batch holds matching back until every file is stored; the context
+    # manager releases it even when the request fails or the client disconnects
+    batch = pipeline.broll_batch(project_id) if project.auto_pipeline else nullcontext()
 
-        try:
-            file_data = await file.read()
+    async with batch:
+        for file in files:
+            file_ext = os.path.splitext(file.filename)[1]
+            broll_id = f"broll_{uuid.uuid4().hex[:8]}{file_ext}"
 
-            with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp:
-                tmp.write(file_data)
-                tmp_path = tmp.name
+            try:
+                file_data = await file.read()
+
+                with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp:
+                    tmp.write(file_data)
+                    tmp_path = tmp.name
             
-            duration = get_video_duration(tmp_path)
-            os.remove(tmp_path)
+                with span("upload", "probe"):
+                    duration = await get_video_duration(tmp_path)
+                os.remove(tmp_path)
 
-            client.put_object(
-                BUCKET_B_ROLL, 
-                broll_id, 
-                io.BytesIO(file_data), 
-                length=len(file_data),
-                content_type=file.content_type
-            )
+                with span("upload", "store"):
+                    client.put_object(
+                        BUCKET_B_ROLL, 
+                        broll_id, 
+                        io.BytesIO(file_data), 
+                        length=len(file_data),
+                        content_type=file.content_type
+                    )
+                observe_transfer("upload", BUCKET_B_ROLL, len(file_data))
             
-            new_broll = BRoll(broll_id=broll_id, path=broll_id, duration=duration)
-            project.b_rolls.append(new_broll)
-            uploaded_ids.append(broll_id)
+                # push each clip as it lands so its analysis can start right away
+                new_broll = BRoll(broll_id=broll_id, path=broll_id, duration=duration)
+                await project.update({"$push": {"b_rolls": new_broll.model_dump()}})
+                uploaded_ids.append(broll_id)
+                if project.auto_pipeline:
+                    await pipeline.advance(project_id)
             
-        except Exception as e:
-            print(f"failed to upload {file.filename}: {e}")
+            except Exception as e:
+                print(f"failed to upload {file.filename}: {e}")
 
-    await project.save()
+    project = await Project.find_one(Project.project_id == project_id)
 
     return {
         "status": f"successfully uploaded {len(uploaded_ids)} b-rolls",
@@ -126,9 +149,11 @@ async def get_project_status(project_id: str):
         "project_id": project.project_id,
         "status": project.status,
         "status_message": project.status_message,
+        "render_progress": project.render_progress,
         "a_roll_duration": project.a_roll.duration if project.a_roll else 0,
         "b_roll_count": len(project.b_rolls),
-        "edit_plan": project.edit_plan
+        "edit_plan": project.edit_plan,
+        "renditions": project.renditions
     }
 
 @router.post("/{project_id}/analyze-broll")
@@ -136,6 +161,8 @@ async def analyze_broll_library(project_id: str, background_tasks: BackgroundTas
     project = await Project.find_one(Project.project_id == project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    if project.auto_pipeline:
+        raise HTTPException(status_code=409, detail="project runs in auto pipeline mode")
     
     # Start the background analysis task
     background_tasks.add_task(run_broll_analysis, project_id)
@@ -145,9 +172,22 @@ async def analyze_broll_library(project_id: str, background_tasks: BackgroundTas
 async def create_edit_plan(project_id: str, background_tasks: BackgroundTasks):
     """Triggers Step 2: Matching analyzed clips to the transcript."""
     project = await Project.find_one(Project.project_id == project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
     
-    # Strict Guard: Do not allow matching if analysis isn't done
-    if project.status != "BROLL_ANALYZED":
+    if project.auto_pipeline:
+        raise HTTPException(status_code=409, detail="project runs in auto pipeline mode")
+
+    # Guard on the actual inputs rather than one exact status: a transcript and analyzed clips
+    transcript_ready = project.a_roll is not None and project.a_roll.transcript is not None
+    clips_ready = bool(project.b_rolls) and all(
+        b.description not in [None, "No description available"] for b in project.b_rolls
+    )
+    if project.status in ["MATCHING_CLIPS", "RENDERING"]:
+        raise HTTPException(status_code=409, detail=f"project is busy ({project.status})")
+    if not transcript_ready:
+        raise HTTPException(status_code=400, detail="A-roll must be transcribed before generating a plan.")
+    if not clips_ready:
         raise HTTPException(
             status_code=400, 
             detail="B-rolls must be analyzed before generating a plan."
@@ -160,7 +200,9 @@ async def create_edit_plan(project_id: str, background_tasks: BackgroundTasks):
 @router.post("/{project_id}/render")
 async def start_rendering(project_id: str, background_tasks: BackgroundTasks):
     project = await Project.find_one(Project.project_id == project_id)
-    
+
+    if project and project.auto_pipeline:
+        raise HTTPException(status_code=409, detail="project runs in auto pipeline mode")
     if not project or project.status != "PLAN_READY":
         raise HTTPException(
             status_code=400, 
@@ -174,6 +216,13 @@ async def start_rendering(project_id: str, background_tasks: BackgroundTasks):
     
     return {"message": "rendering started", "project_id": project_id}
 
+# stops a running ffmpeg render; the project is marked FAILED with a cancellation message
+@router.post("/{project_id}/cancel-render")
+async def stop_rendering(project_id: str):
+    if not await cancel_render(project_id):
+        raise HTTPException(status_code=404, detail="no active render for this project")
+    return {"message": "render cancellation requested", "project_id": project_id}
+
 # allows the user to download the final rendered video file
 # @router.get("/{project_id}/download")
 # async def download_video(project_id: str):
@@ -193,14 +242,74 @@ async def start_rendering(project_id: str, background_tasks: BackgroundTasks):
 
 
 @router.get("/{project_id}/download")
-async def download_video(project_id: str):
+async def download_video(project_id: str, rendition: str = Query(None)):
     project = await Project.find_one(Project.project_id == project_id)
-    
-    url = client.presigned_get_object(
-        BUCKET_OUTPUTS, 
-        project.final_video_path,
-        response_headers={'response-content-type': 'video/mp4'}
+    if not project or project.status != "COMPLETED":
+        raise HTTPException(status_code=404, detail="video not ready or not found")
+
+    # projects rendered before the streaming ladder have a single mp4
+    if not project.hls_prefix:
+        url = client.presigned_get_object(
+            BUCKET_OUTPUTS, 
+            project.final_video_path,
+            response_headers={'response-content-type': 'video/mp4'}
+        )
+        return RedirectResponse(url=url)
+
+    rendition = rendition or project.renditions[0]
+    if rendition not in project.renditions:
+        raise HTTPException(status_code=404, detail="rendition not found")
+
+    # init segment + media segments of one rendition form a playable fragmented mp4
+    playlist = client.get_object(BUCKET_OUTPUTS, f"{project.hls_prefix}/{rendition}.m3u8")
+    media_files = playlist_media_files(playlist.read().decode())
+    playlist.close()
+    playlist.release_conn()
+
+    # playback goes through the hls route; this is a plain file download, so announce its size
+    total_size = sum(
+        client.stat_object(BUCKET_OUTPUTS, f"{project.hls_prefix}/{name}").size for name in media_files
     )
+
+    def stream_segments():
+        for name in media_files:
+            segment = client.get_object(BUCKET_OUTPUTS, f"{project.hls_prefix}/{name}")
+            try:
+                yield from segment.stream(64 * 1024)
+            finally:
+                segment.close()
+                segment.release_conn()
+
+    return StreamingResponse(
+        stream_segments(),
+        media_type="video/mp4",
+        headers={
+            "Content-Disposition": f'attachment; filename="final_{project_id}_{rendition}.mp4"',
+            "Content-Length": str(total_size)
+        }
+    )
+
+# serves the adaptive stream: playlists inline, segments via presigned range-friendly urls
+@router.get("/{project_id}/hls/{asset_name}")
+async def stream_hls_asset(project_id: str, asset_name: str):
+    project = await Project.find_one(Project.project_id == project_id)
+    if not project or not project.hls_prefix:
+        raise HTTPException(status_code=404, detail="stream not ready or not found")
+
+    object_name = f"{project.hls_prefix}/{asset_name}"
+
+    if asset_name.endswith(".m3u8"):
+        try:
+            playlist = client.get_object(BUCKET_OUTPUTS, object_name)
+        except Exception:
+            raise HTTPException(status_code=404, detail="playlist not found")
+        content = playlist.read()
+        playlist.close()
+        playlist.release_conn()
+        # relative uris in the playlist resolve back to this route
+        return Response(content=content, media_type="application/vnd.apple.mpegurl")
+
+    url = client.presigned_get_object(BUCKET_OUTPUTS, object_name)
     return RedirectResponse(url=url)
 
 
@@ -1,20 +1,36 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.api.uploads import router as project_router
 from beanie import init_beanie
 from app.models.project import Project
+from app.models.pipeline import PipelineClaim
 from app.api import uploads
+from app.workers.pipeline import resume_pipelines
+from app.utils.metrics import mark_worker_stopped, render_metrics
+from app.utils.registry import warmup_from_env
+from app.utils.storage import ensure_buckets
+from prometheus_client import CONTENT_TYPE_LATEST
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     client = AsyncIOMotorClient("mongodb://localhost:27017")
-    await init_beanie(database=client.cuesens_db, document_models=[Project])
+    await init_beanie(database=client.cuesens_db, document_models=[Project, PipelineClaim])
+    await ensure_buckets()
     
     print("Database connected and Beanie initialized")
+
+    # only processes started with CUESENSE_WARMUP preload models, off the event loop
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup_from_env))
+    # picks up auto-pipeline projects left behind by a restart or by another worker dying
+    resume_task = asyncio.create_task(resume_pipelines())
     yield
+    resume_task.cancel()
+    warmup_task.cancel()
     client.close()
+    mark_worker_stopped()
     print("Database connection closed")
 
 app = FastAPI(
@@ -48,6 +64,17 @@ async def root():
         "docs": "/docs"
     }
 
+# prometheus scrape target; project counts are refreshed per scrape with one aggregation
+@app.get("/metrics")
+async def metrics():
+    counts = await Project.aggregate(
+        [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    ).to_list()
+    return Response(
+        content=render_metrics({c["_id"]: c["count"] for c in counts}),
+        media_type=CONTENT_TYPE_LATEST
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,17 @@
+from beanie import Document
+from pymongo import ASCENDING, IndexModel
+
+
+# a running auto-pipeline node (or an in-flight b-roll upload) and the api worker executing it.
+# kept apart from Project so full project.save() calls never overwrite a heartbeat
+class PipelineClaim(Document):
+    project_id: str
+    node: str
+    owner: str
+    heartbeat: float
+
+    class Settings:
+        name = "pipeline_claims"
+        indexes = [
+            IndexModel([("project_id", ASCENDING), ("node", ASCENDING)], unique=True)
+        ]
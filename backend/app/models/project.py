@@ -23,10 +23,15 @@ class Project(Document):
     name:str
     status: str = "DRAFT"
     status_message: str = ""
+    render_progress: float = 0.0
+    cancel_requested: bool = False
+    auto_pipeline: bool = False
     a_roll: Optional[ARoll] = None
     b_rolls: List[BRoll] = []
     edit_plan: List[dict] = []
     final_video_path:str=""
+    hls_prefix: str = ""
+    renditions: List[str] = []
     
     class Settings:
         name = "projects" 
\ No newline at end of file
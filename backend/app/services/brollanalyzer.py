@@ -3,31 +3,33 @@ import tempfile
 import time
 import json
 import asyncio
-import google.generativeai as genai
 from app.utils.storage import client, BUCKET_B_ROLL
-from dotenv import load_dotenv
-load_dotenv()
+from app.utils.metrics import span, observe_transfer
+from app.utils.registry import get_genai, get_gemini_model
 
 
-# setup gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.5-flash") 
-
 async def analyze_broll(broll_id: str):
     with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
         try:
+            # the first call in a process imports and configures the sdk, keep that off the loop
+            genai = await asyncio.to_thread(get_genai)
+
             # fetch from minio
-            response = client.get_object(BUCKET_B_ROLL, broll_id)
-            temp_file.write(response.read())
-            temp_file.flush()
+            with span("analysis", "download"):
+                response = client.get_object(BUCKET_B_ROLL, broll_id)
+                temp_file.write(response.read())
+                temp_file.flush()
+            observe_transfer("download", BUCKET_B_ROLL, os.path.getsize(temp_file.name))
 
             # upload to gemini api
-            video_file = genai.upload_file(path=temp_file.name)
+            with span("analysis", "gemini_upload"):
+                video_file = await asyncio.to_thread(genai.upload_file, path=temp_file.name)
 
             # wait for processing 
-            while video_file.state.name == "PROCESSING":
-                await asyncio.sleep(2)
-                video_file = genai.get_file(video_file.name)
+            with span("analysis", "gemini_processing"):
+                while video_file.state.name == "PROCESSING":
+                    await asyncio.sleep(2)
+                    video_file = genai.get_file(video_file.name)
 
             # strict prompt for structured output
             prompt = """
@@ -39,10 +41,13 @@ async def analyze_broll(broll_id: str):
             """
 
             # generation_config to force json output
-            response = model.generate_content(
-                [prompt, video_file],
-                generation_config={"response_mime_type": "application/json"}
-            )
+            with span("analysis", "gemini_generate"):
+                model = await asyncio.to_thread(get_gemini_model)
+                response = await asyncio.to_thread(
+                    model.generate_content,
+                    [prompt, video_file],
+                    generation_config={"response_mime_type": "application/json"}
+                )
             
             genai.delete_file(video_file.name)
             
@@ -1,10 +1,8 @@
-import os
+import asyncio
 import json
-import google.generativeai as genai
 from app.models.project import Project
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.5-flash")
+from app.utils.metrics import span
+from app.utils.registry import get_gemini_model
 
 async def generate_edit_plan(project_id: str):
     project = await Project.find_one(Project.project_id == project_id)
@@ -62,16 +60,19 @@ async def generate_edit_plan(project_id: str):
             If transcript says "I started my business in a small garage," and B-roll 'broll_123' shows a cluttered workspace, match it at the timestamp of 'small garage'.
             """
 
-    response = model.generate_content(
-        prompt,
-        generation_config={"response_mime_type": "application/json"}
-    )
+    with span("matching", "gemini_generate"):
+        # the first call in a process imports and configures the sdk, keep that off the loop too
+        model = await asyncio.to_thread(get_gemini_model)
+        response = await asyncio.to_thread(
+            model.generate_content,
+            prompt,
+            generation_config={"response_mime_type": "application/json"}
+        )
     
     try:
         edit_plan = json.loads(response.text)
-        project.edit_plan = edit_plan
-        project.status = "PLAN_READY"
-        await project.save()
+        # $set only these fields so clips pushed while matching ran are kept
+        await project.set({"edit_plan": edit_plan, "status": "PLAN_READY"})
         return edit_plan
     except Exception as e:
         print(f"failed to parse edit plan: {e}")
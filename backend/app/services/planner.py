@@ -1,18 +1,25 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
+from app.utils.registry import get_embedder
 
 class SmartPlanner:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2') 
+        self.model = get_embedder()
         self.min_confidence = 0.75  #minimum confidence
         self.refractory_period = 5.0 #gap time
 
     def generate_plan(self, transcript, broll_library):
         plan = []
         last_insertion_end = -self.refractory_period
+        if not transcript or not broll_library:
+            return plan
+
+        # encode every segment and description once, in batches, then score them all at once
+        scores = self.score_matrix(
+            [segment['text'] for segment in transcript],
+            [broll['description'] for broll in broll_library]
+        )
 
         #Process transcript segments
-        for segment in transcript:
+        for i, segment in enumerate(transcript):
             start = segment['start']
             
             # Pacing Check
@@ -20,7 +27,7 @@ class SmartPlanner:
                 continue
 
             # Semantic Matching
-            best_match = self._find_best_broll(segment['text'], broll_library)
+            best_match = self._find_best_broll(scores[i], broll_library)
             
             if best_match and best_match['score'] >= self.min_confidence:
                 insertion = {
@@ -35,15 +42,17 @@ class SmartPlanner:
 
         return plan
 
-    def _find_best_broll(self, text, library):
-        text_emb = self.model.encode(text, convert_to_tensor=True)
+    def score_matrix(self, texts, descriptions):
+        from sentence_transformers import util
+        text_embs = self.model.encode(texts, convert_to_tensor=True)
+        broll_embs = self.model.encode(descriptions, convert_to_tensor=True)
+        return util.cos_sim(text_embs, broll_embs)
+
+    def _find_best_broll(self, scores, library):
         best = None
         max_score = -1
 
-        for broll in library:
-            broll_emb = self.model.encode(broll['description'], convert_to_tensor=True)
-            score = util.cos_sim(text_emb, broll_emb).item()
-            
+        for broll, score in zip(library, scores.tolist()):
             if score > max_score:
                 max_score = score
                 best = {**broll, "score": score}
@@ -1,11 +1,18 @@
-WIDTH = 720 
+import re
+
+WIDTH = 720
 HEIGHT = 1280
 
-def build_ffmpeg_command(aroll_path, broll_paths, edit_plan, output_path):
-    inputs = [f'-i "{aroll_path}"']
-    for b_path in broll_paths:
-        inputs.append(f'-i "{b_path}"')
-    
+# adaptive streaming ladder, highest quality first
+RENDITIONS = [
+    {"name": "720p", "width": 720, "video_bitrate": "2800k", "audio_bitrate": "128k"},
+    {"name": "540p", "width": 540, "video_bitrate": "1400k", "audio_bitrate": "96k"},
+    {"name": "360p", "width": 360, "video_bitrate": "800k", "audio_bitrate": "64k"},
+]
+SEGMENT_SECONDS = 4
+MASTER_PLAYLIST = "master.m3u8"
+
+def _build_overlay_filter(edit_plan):
     filter_parts = []
     last_out = "[0:v]"
 
@@ -13,31 +20,93 @@ def build_ffmpeg_command(aroll_path, broll_paths, edit_plan, output_path):
         b_idx = i + 1
         start = edit["start_in_aroll"]
         end = start + edit["duration"]
-        
+
         v_label = f"v{b_idx}"
         v_out = f"v{b_idx}_out"
         filter_parts.append(
             f"[{b_idx}:v]scale={WIDTH}:{HEIGHT}:force_original_aspect_ratio=increase,"
             f"crop={WIDTH}:{HEIGHT},setpts=PTS-STARTPTS+{start}/TB[{v_label}]"
         )
-        
+
 
         filter_parts.append(f"{last_out}[{v_label}]overlay=x=0:y=0:enable='between(t,{start},{end})'[{v_out}]")
-        
+
         last_out = f"[{v_out}]"
 
+    return filter_parts, last_out
+
+def _build_inputs(aroll_path, broll_paths):
+    inputs = ["-i", aroll_path]
+    for b_path in broll_paths:
+        inputs += ["-i", b_path]
+    return inputs
+
+# builds ffmpeg arguments (without the binary) for app.utils.ffmpeg.run_ffmpeg
+def build_hls_command(aroll_path, broll_paths, edit_plan, output_dir):
+    """
+    Composites the edit once, then splits the result into every rendition of
+    the ladder and writes fMP4 HLS segments plus a master playlist into output_dir.
+    Segments are written as .tmp and renamed once complete, so finished ones can
+    be uploaded while the encode is still running.
+    """
+    inputs = _build_inputs(aroll_path, broll_paths)
+    filter_parts, last_out = _build_overlay_filter(edit_plan)
+
+    # fan the composited stream out, one branch per rendition
+    split_labels = "".join(f"[split{i}]" for i in range(len(RENDITIONS)))
+    filter_parts.append(f"{last_out}split={len(RENDITIONS)}{split_labels}")
+    for i, rendition in enumerate(RENDITIONS):
+        filter_parts.append(f"[split{i}]scale={rendition['width']}:-2[out{i}]")
+
     filter_complex = ";".join(filter_parts)
-    
-
-    cmd = [
-        "ffmpeg", "-y",
-        * " ".join(inputs).split(),
-        "-filter_complex", f'"{filter_complex}"',
-        "-map", last_out,
-        "-map", "0:a",
+
+    maps = []
+    bitrates = []
+    for i, rendition in enumerate(RENDITIONS):
+        maps += ["-map", f"[out{i}]", "-map", "0:a"]
+        bitrates += [
+            f"-b:v:{i}", rendition["video_bitrate"],
+            f"-maxrate:v:{i}", rendition["video_bitrate"],
+            f"-bufsize:v:{i}", rendition["video_bitrate"],
+            f"-b:a:{i}", rendition["audio_bitrate"],
+        ]
+
+    var_stream_map = " ".join(
+        f"v:{i},a:{i},name:{rendition['name']}" for i, rendition in enumerate(RENDITIONS)
+    )
+
+    return [
+        "-y",
+        *inputs,
+        "-filter_complex", filter_complex,
+        *maps,
         "-c:v", "libx264", "-preset", "ultrafast",
-        "-crf", "23", "-c:a", "aac", "-shortest",
-        output_path
+        "-c:a", "aac",
+        *bitrates,
+        # keyframe on every segment boundary so all renditions switch cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SECONDS})",
+        "-shortest",
+        "-f", "hls",
+        "-hls_time", str(SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "temp_file",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "%v_init.mp4",
+        "-hls_segment_filename", f"{output_dir}/%v_%05d.m4s",
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", var_stream_map,
+        f"{output_dir}/%v.m3u8"
     ]
-    
-    return " ".join(cmd)
\ No newline at end of file
+
+def playlist_media_files(playlist_text):
+    """returns the init file and segments referenced by a media playlist, in play order."""
+    files = []
+    for line in playlist_text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MAP"):
+            match = re.search(r'URI="([^"]+)"', line)
+            if match:
+                files.append(match.group(1))
+        elif line and not line.startswith("#"):
+            files.append(line)
+    return files
@@ -1,9 +1,21 @@
+import asyncio
 import os
 import tempfile
-from faster_whisper import WhisperModel
 from app.utils.storage import client, BUCKET_A_ROLL
+from app.utils.metrics import span, observe_transfer
+from app.utils.registry import get_whisper_model
 
-model = WhisperModel("base", device="cpu", compute_type="float32")
+def _run_whisper(path: str):
+    # segments are decoded lazily, so the list has to be built inside the worker thread
+    segments, info = get_whisper_model().transcribe(path,task="translate",vad_filter=True)
+    return [
+        {
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text.strip()
+        }
+        for segment in segments
+    ]
 
 async def transcribe_video(file_id: str):
     """
@@ -12,22 +24,15 @@ async def transcribe_video(file_id: str):
     with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
         try:
             #Download from MinIO
-            response = client.get_object(BUCKET_A_ROLL, file_id)
-            temp_video.write(response.read())
-            temp_video.flush()
+            with span("transcription", "download"):
+                response = client.get_object(BUCKET_A_ROLL, file_id)
+                temp_video.write(response.read())
+                temp_video.flush()
+            observe_transfer("download", BUCKET_A_ROLL, os.path.getsize(temp_video.name))
             
-            #Run Local Transcription
-            segments, info = model.transcribe(temp_video.name,task="translate",vad_filter=True)
-            
-            #Format segments for our Matching Engine
-            formatted_segments = [
-                {
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": segment.text.strip()
-                }
-                for segment in segments
-            ]
+            #Run Local Transcription off the event loop so other stages keep moving
+            with span("transcription", "whisper"):
+                formatted_segments = await asyncio.to_thread(_run_whisper, temp_video.name)
             
             return formatted_segments
 
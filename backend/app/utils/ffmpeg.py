@@ -0,0 +1,163 @@
+import asyncio
+import os
+from collections import deque
+
+STDERR_TAIL_LINES = 40
+KILL_GRACE_SECONDS = 5
+
+
+class FFmpegError(Exception):
+    def __init__(self, message: str, returncode=None, stderr_tail: str = ""):
+        super().__init__(f"{message}: {stderr_tail}" if stderr_tail else message)
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+
+
+class FFmpegCancelled(FFmpegError):
+    pass
+
+
+async def _terminate(proc):
+    if proc.returncode is not None:
+        return
+    proc.terminate()
+    try:
+        await asyncio.wait_for(proc.wait(), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def _drain_stderr(stream, tail: deque):
+    # keep only the last lines instead of buffering the whole log in memory
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        tail.append(line.decode(errors="replace").rstrip())
+
+
+def _parse_seconds(block: dict):
+    for key in ("out_time_us", "out_time_ms"):
+        # ffmpeg reports both in microseconds
+        value = block.get(key, "")
+        if value.lstrip("-").isdigit():
+            return max(int(value), 0) / 1_000_000
+    return None
+
+
+async def _read_progress(reader, duration, on_progress):
+    block = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        block[key] = value
+        if key != "progress":
+            continue
+
+        out_seconds = _parse_seconds(block)
+        try:
+            fps = float(block.get("fps", 0) or 0)
+        except ValueError:
+            fps = 0.0
+        speed = block.get("speed", "").rstrip("x").strip()
+        percent = None
+        if duration and out_seconds is not None:
+            percent = min(out_seconds / duration * 100, 100.0)
+        if value == "end":
+            percent = 100.0
+
+        if on_progress:
+            # a failing callback (e.g. a db hiccup) must not stop the drain, or ffmpeg blocks on a full pipe
+            try:
+                await on_progress({
+                    "percent": percent,
+                    "fps": fps,
+                    "speed": float(speed) if speed.replace(".", "", 1).isdigit() else None,
+                    "out_seconds": out_seconds,
+                })
+            except Exception as e:
+                print(f"ffmpeg progress callback failed: {e}")
+        block = {}
+
+
+async def run_ffmpeg(args, duration: float = None, on_progress=None, timeout: float = None, cancel_event: asyncio.Event = None):
+    """
+    Runs ffmpeg without blocking the event loop. Progress is read from a side
+    pipe (-progress) and reported through on_progress as percent/fps/speed.
+    Raises FFmpegCancelled when cancel_event is set or the timeout expires, and
+    FFmpegError with the tail of stderr when ffmpeg exits non-zero.
+    """
+    progress_read, progress_write = os.pipe()
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-progress", f"pipe:{progress_write}", *args]
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=(progress_write,),
+        )
+    except BaseException:
+        # e.g. ffmpeg is not installed
+        os.close(progress_read)
+        raise
+    finally:
+        os.close(progress_write)
+
+    loop = asyncio.get_running_loop()
+    progress_reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(progress_reader), os.fdopen(progress_read, "rb")
+    )
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    readers = asyncio.gather(
+        _drain_stderr(proc.stderr, stderr_tail),
+        _read_progress(progress_reader, duration, on_progress),
+    )
+
+    waiters = [asyncio.ensure_future(proc.wait())]
+    if cancel_event is not None:
+        waiters.append(asyncio.ensure_future(cancel_event.wait()))
+
+    try:
+        finished, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if waiters[0] not in finished:
+            await _terminate(proc)
+            await readers
+            reason = "cancelled" if finished else f"timed out after {timeout}s"
+            raise FFmpegCancelled(f"ffmpeg {reason}", proc.returncode)
+        await readers
+    except asyncio.CancelledError:
+        await _terminate(proc)
+        raise
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+        if not readers.done():
+            readers.cancel()
+        transport.close()
+
+    if proc.returncode != 0:
+        raise FFmpegError("ffmpeg failed", proc.returncode, "\n".join(stderr_tail))
+
+
+async def run_ffprobe(args, timeout: float = 30):
+    """returns ffprobe's stdout, raising FFmpegError on failure or timeout."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        await _terminate(proc)
+        raise
+    if proc.returncode != 0:
+        raise FFmpegError("ffprobe failed", proc.returncode, stderr.decode(errors="replace").strip())
+    return stdout.decode()
@@ -0,0 +1,90 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# with several api workers, set PROMETHEUS_MULTIPROC_DIR (an empty directory, before start)
+# so every worker writes its samples there and /metrics merges them
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+STAGE_DURATION = Histogram(
+    "cuesense_stage_duration_seconds",
+    "Wall-clock time spent in each pipeline stage and sub-step",
+    ["stage", "step"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+STAGE_FAILURES = Counter(
+    "cuesense_stage_failures_total",
+    "Stage or sub-step executions that raised",
+    ["stage", "step"],
+)
+TRANSFER_BYTES = Histogram(
+    "cuesense_transfer_bytes",
+    "Size of objects moved to or from object storage",
+    ["direction", "bucket"],
+    buckets=tuple(2 ** p for p in range(16, 34, 2)),
+)
+FFMPEG_REALTIME_FACTOR = Histogram(
+    "cuesense_ffmpeg_realtime_factor",
+    "Seconds of media produced per wall-clock second of ffmpeg",
+    ["command"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+INFLIGHT_JOBS = Gauge(
+    "cuesense_inflight_jobs",
+    "Background jobs currently running, by project status",
+    ["status"],
+    multiprocess_mode="livesum",
+)
+
+@contextmanager
+def span(stage: str, step: str = "total"):
+    """times a block into the stage histogram and counts it as failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.labels(stage, step).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage, step).observe(time.perf_counter() - started)
+
+@contextmanager
+def track_job(status: str):
+    INFLIGHT_JOBS.labels(status).inc()
+    try:
+        yield
+    finally:
+        INFLIGHT_JOBS.labels(status).dec()
+
+def observe_transfer(direction: str, bucket: str, size: int):
+    TRANSFER_BYTES.labels(direction, bucket).observe(size)
+
+def observe_realtime_factor(command: str, media_seconds: float, wall_seconds: float):
+    if media_seconds > 0 and wall_seconds > 0:
+        FFMPEG_REALTIME_FACTOR.labels(command).observe(media_seconds / wall_seconds)
+
+class _ProjectCounts:
+    # built per scrape from the database, so it is the same whichever worker answers
+    def __init__(self, counts: dict):
+        self.counts = counts
+
+    def collect(self):
+        family = GaugeMetricFamily("cuesense_projects", "Projects stored in the database, by status", labels=["status"])
+        for status, count in self.counts.items():
+            family.add_metric([status], count)
+        yield family
+
+def render_metrics(project_counts: dict) -> bytes:
+    """exposition text for /metrics, merged across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry) + generate_latest(_ProjectCounts(project_counts))
+
+def mark_worker_stopped():
+    """drops this worker's live gauges from the shared directory on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
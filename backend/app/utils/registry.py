@@ -0,0 +1,110 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# process-wide instances, created on first use so the api never pays for models it doesn't run
+_instances = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(name):
+    with _locks_guard:
+        return _locks.setdefault(name, threading.Lock())
+
+def _shared(name, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        # one lock per name: a factory may load other names (gemini needs genai),
+        # and a slow load of one model never blocks the others
+        with _lock_for(name):
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+EMBEDDER_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDER_BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+
+# inference backends are chosen per deployment through the environment
+def build_whisper_model(model_size: str = None, compute_type: str = None):
+    """
+    compute_type accepts any ctranslate2 type; int8 / int8_float32 are the fast
+    paths on cpu-only workers, float32 is the most accurate.
+    """
+    from faster_whisper import WhisperModel
+    return WhisperModel(
+        model_size or os.getenv("WHISPER_MODEL", "base"),
+        device="cpu",
+        compute_type=compute_type or os.getenv("WHISPER_COMPUTE_TYPE", "float32"),
+        cpu_threads=int(os.getenv("WHISPER_CPU_THREADS", "0"))
+    )
+
+def build_embedder(backend: str = None):
+    """
+    torch: full precision pytorch. torch-int8: dynamic int8 quantization of the
+    linear layers. onnx / onnx-int8: onnx runtime, the latter loading one of the
+    quantized exports shipped with the model (EMBEDDER_ONNX_FILE).
+    """
+    from sentence_transformers import SentenceTransformer
+    backend = backend or os.getenv("EMBEDDER_BACKEND", "torch")
+
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDER_MODEL, device="cpu")
+    if backend == "torch-int8":
+        import torch
+        model = SentenceTransformer(EMBEDDER_MODEL, device="cpu")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return SentenceTransformer(EMBEDDER_MODEL, device="cpu", backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            EMBEDDER_MODEL,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": os.getenv("EMBEDDER_ONNX_FILE", "onnx/model_quint8_avx2.onnx")}
+        )
+    raise ValueError(f"unknown embedder backend '{backend}', expected one of {EMBEDDER_BACKENDS}")
+
+def _load_genai():
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai
+
+def get_whisper_model():
+    return _shared("whisper", build_whisper_model)
+
+def get_genai():
+    """the configured google.generativeai module (file upload/get/delete live here)."""
+    return _shared("genai", _load_genai)
+
+def get_gemini_model():
+    return _shared("gemini", lambda: get_genai().GenerativeModel("gemini-2.5-flash"))
+
+def get_embedder():
+    return _shared("embedder", build_embedder)
+
+_LOADERS = {
+    "whisper": get_whisper_model,
+    "gemini": get_gemini_model,
+    "embedder": get_embedder,
+}
+
+def override(name: str, instance):
+    """swaps in an instance (e.g. a local stand-in) for everything that asks for name."""
+    with _lock_for(name):
+        _instances[name] = instance
+
+def warmup(names=None):
+    """eagerly loads the given models, meant for processes that will actually run the pipeline."""
+    for name in names or _LOADERS:
+        _LOADERS[name]()
+
+def warmup_from_env():
+    """reads CUESENSE_WARMUP, a comma separated list of models to preload (empty by default)."""
+    names = [n.strip() for n in os.getenv("CUESENSE_WARMUP", "").split(",") if n.strip()]
+    if names:
+        warmup(names)
+    return names
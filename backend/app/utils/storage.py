@@ -1,3 +1,4 @@
+import asyncio
 from minio import Minio
 import os
 
@@ -12,7 +13,11 @@ client = Minio(
     secure=False
 )
 
-# Ensure buckets exist on startup
-for bucket in [BUCKET_A_ROLL, BUCKET_B_ROLL,BUCKET_OUTPUTS]:
-    if not client.bucket_exists(bucket):
-        client.make_bucket(bucket)
\ No newline at end of file
+# constructing the client does no i/o; buckets are bootstrapped from the app lifespan
+def _ensure_buckets():
+    for bucket in [BUCKET_A_ROLL, BUCKET_B_ROLL,BUCKET_OUTPUTS]:
+        if not client.bucket_exists(bucket):
+            client.make_bucket(bucket)
+
+async def ensure_buckets():
+    await asyncio.to_thread(_ensure_buckets)
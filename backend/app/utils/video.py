@@ -1,14 +1,13 @@
-import subprocess
+from app.utils.ffmpeg import run_ffprobe
 
-def get_video_duration(file_path: str) -> float:
+async def get_video_duration(file_path: str) -> float:
     """helper to extract duration using ffprobe."""
     try:
-        cmd = [
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        stdout = await run_ffprobe([
+            "-v", "error", "-show_entries", "format=duration",
             "-of", "default=noprint_wrappers=1:nokey=1", file_path
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        return float(result.stdout.strip())
+        ])
+        return float(stdout.strip())
     except Exception as e:
         print(f"ffprobe error: {e}")
         return 0.0
\ No newline at end of file
@@ -1,13 +1,82 @@
+import asyncio
 import os
 import secrets
-import subprocess
 import tempfile
+import time
 from app.models.project import Project
 from app.services.transcriber import transcribe_video
 from app.services.brollanalyzer import analyze_broll
 from app.services.matcher import generate_edit_plan
-from app.services.renderer import build_ffmpeg_command
+from app.services.renderer import build_hls_command, MASTER_PLAYLIST, RENDITIONS
 from app.utils.storage import client,BUCKET_A_ROLL, BUCKET_B_ROLL, BUCKET_OUTPUTS
+from app.utils.metrics import span, track_job, observe_transfer, observe_realtime_factor
+from app.utils.ffmpeg import FFmpegCancelled, run_ffmpeg
+
+HLS_CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+RENDER_TIMEOUT_SECONDS = float(os.getenv("CUESENSE_RENDER_TIMEOUT", "3600"))
+SEGMENT_POLL_SECONDS = 1.0
+CANCEL_POLL_SECONDS = 2.0
+ACTIVE_RENDER_STATUSES = ["RENDER_QUEUED", "RENDERING"]
+
+async def cancel_render(project_id: str) -> bool:
+    """
+    Flags an active render for cancellation. The flag lives on the project so the
+    request can land on any api worker; the one rendering picks it up within a poll.
+    """
+    result = await Project.find_one(
+        {"project_id": project_id, "status": {"$in": ACTIVE_RENDER_STATUSES}}
+    ).update({"$set": {"cancel_requested": True}})
+    return bool(result and result.matched_count)
+
+async def _watch_cancel(project_id: str, cancel_event: asyncio.Event):
+    while not cancel_event.is_set():
+        project = await Project.find_one(Project.project_id == project_id)
+        if project is None or project.cancel_requested:
+            cancel_event.set()
+            return
+        await asyncio.sleep(CANCEL_POLL_SECONDS)
+
+def _put_file(local_file: str, object_name: str):
+    content_type = HLS_CONTENT_TYPES.get(os.path.splitext(local_file)[1], "application/octet-stream")
+    size = os.path.getsize(local_file)
+    with open(local_file, "rb") as f:
+        client.put_object(BUCKET_OUTPUTS, object_name, f, size, content_type=content_type)
+    observe_transfer("upload", BUCKET_OUTPUTS, size)
+
+def _get_file(bucket: str, object_name: str, local_file: str):
+    response = client.get_object(bucket, object_name)
+    try:
+        with open(local_file, "wb") as f:
+            for chunk in response.stream(1024 * 1024):
+                f.write(chunk)
+    finally:
+        response.close()
+        response.release_conn()
+
+async def _upload_finished_hls_files(hls_dir: str, hls_prefix: str, uploaded: set, final: bool = False):
+    """
+    Uploads segments ffmpeg has finished (it writes .tmp files and renames them
+    when complete) and deletes them locally. Init files and playlists are only
+    final once the encode ends, so they wait for the final pass.
+    """
+    for name in sorted(os.listdir(hls_dir)):
+        if name in uploaded or name.endswith(".tmp"):
+            continue
+        if not final and not name.endswith(".m4s"):
+            continue
+        local_file = os.path.join(hls_dir, name)
+        await asyncio.to_thread(_put_file, local_file, f"{hls_prefix}/{name}")
+        uploaded.add(name)
+        os.remove(local_file)
+
+def _remove_files(hls_prefix: str, names):
+    for name in names:
+        client.remove_object(BUCKET_OUTPUTS, f"{hls_prefix}/{name}")
 
 # background logic for a-roll transcription
 async def run_transcription_pipeline(project_id: str):
@@ -16,7 +85,8 @@ async def run_transcription_pipeline(project_id: str):
         return
     
     try:
-        segments = await transcribe_video(project.a_roll.file_id)
+        with track_job("TRANSCRIBING"), span("transcription"):
+            segments = await transcribe_video(project.a_roll.file_id)
         project.a_roll.transcript = segments
         project.status = "TRANSCRIPTION_COMPLETE"
         await project.save()
@@ -83,25 +153,26 @@ async def run_broll_analysis(project_id: str):
         return
 
     try:
-        project.status = "ANALYZING_BROLL"
-        await project.save()
-
-        for i, broll in enumerate(project.b_rolls):
-            print(f"DEBUG: Starting Gemini analysis for clip {i+1}/{len(project.b_rolls)}: {broll.broll_id}") 
-            project.status_message = f"Starting Gemini analysis for clip {i+1}/{total_clips}"
+        with track_job("ANALYZING_BROLL"), span("analysis"):
+            project.status = "ANALYZING_BROLL"
             await project.save()
+
+            for i, broll in enumerate(project.b_rolls):
+                print(f"DEBUG: Starting Gemini analysis for clip {i+1}/{len(project.b_rolls)}: {broll.broll_id}") 
+                project.status_message = f"Starting Gemini analysis for clip {i+1}/{total_clips}"
+                await project.save()
             
             
-            if broll.description in [None, "No description available"]:
-                analysis = await analyze_broll(broll.broll_id)
-                broll.description = analysis.get("description")
-                broll.keywords = analysis.get("keywords", [])
-                broll.mood = analysis.get("mood", "neutral")
-                project.b_rolls[i] = broll
-                await project.save()
-                print(f"DEBUG: Successfully analyzed {broll.broll_id}") 
-            else:
-                print(f"DEBUG: Skipping {broll.broll_id} (already has description)") 
+                if broll.description in [None, "No description available"]:
+                    analysis = await analyze_broll(broll.broll_id)
+                    broll.description = analysis.get("description")
+                    broll.keywords = analysis.get("keywords", [])
+                    broll.mood = analysis.get("mood", "neutral")
+                    project.b_rolls[i] = broll
+                    await project.save()
+                    print(f"DEBUG: Successfully analyzed {broll.broll_id}") 
+                else:
+                    print(f"DEBUG: Skipping {broll.broll_id} (already has description)") 
 
         
         project.status = "BROLL_ANALYZED"
@@ -118,7 +189,8 @@ async def run_matching_logic(project_id: str):
     project = await Project.find_one(Project.project_id == project_id)
     project.status = "MATCHING_CLIPS"
     await project.save()
-    await generate_edit_plan(project_id)
+    with track_job("MATCHING_CLIPS"), span("matching"):
+        await generate_edit_plan(project_id)
         
 
 async def run_video_render(project_id: str):
@@ -126,56 +198,112 @@ async def run_video_render(project_id: str):
     if not project or not project.edit_plan:
         return
 
+    # segments already pushed to MinIO, removed again if the render does not complete
+    hls_prefix = f"{project_id}/hls_{secrets.token_hex(3)}"
+    uploaded = set()
+
+    # the render only $sets its own fields, so clips uploaded or analyzed meanwhile are kept
     try:
-        project.status = "RENDERING"
-        project.status_message = "Preparing workspace..."
-        await project.save()
+        with track_job("RENDERING"), span("rendering"):
+            # cancelled while still queued for a render slot
+            if project.cancel_requested:
+                raise FFmpegCancelled("render cancelled")
+            await project.set({"status": "RENDERING", "status_message": "Preparing workspace..."})
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            #Download A-Roll
-            aroll_path = os.path.join(tmp_dir, "aroll.mp4")
-            aroll_data = client.get_object(BUCKET_A_ROLL, project.a_roll.file_id)
-            with open(aroll_path, "wb") as f:
-                f.write(aroll_data.read())
-
-            # Download B-Rolls used in plan
-            local_broll_paths = []
-            for i, edit in enumerate(project.edit_plan):
-                project.status_message = f"Downloading assets for clip {i+1}..."
-                await project.save()
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                #Download A-Roll
+                aroll_path = os.path.join(tmp_dir, "aroll.mp4")
+                with span("rendering", "download"):
+                    await asyncio.to_thread(_get_file, BUCKET_A_ROLL, project.a_roll.file_id, aroll_path)
+                observe_transfer("download", BUCKET_A_ROLL, os.path.getsize(aroll_path))
+
+                # Download B-Rolls used in plan
+                local_broll_paths = []
+                for i, edit in enumerate(project.edit_plan):
+                    await project.set({"status_message": f"Downloading assets for clip {i+1}..."})
                 
-                b_path = os.path.join(tmp_dir, f"b_{i}.mp4")
-                b_data = client.get_object(BUCKET_B_ROLL, edit["broll_id"])
-                with open(b_path, "wb") as f:
-                    f.write(b_data.read())
-                local_broll_paths.append(b_path)
-
-            #Execute Render
-            local_output = os.path.join(tmp_dir, "final_render.mp4")
-            project.status_message = "Executing FFmpeg render engine..."
-            await project.save()
+                    b_path = os.path.join(tmp_dir, f"b_{i}.mp4")
+                    with span("rendering", "download"):
+                        await asyncio.to_thread(_get_file, BUCKET_B_ROLL, edit["broll_id"], b_path)
+                    observe_transfer("download", BUCKET_B_ROLL, os.path.getsize(b_path))
+                    local_broll_paths.append(b_path)
 
-            cmd = build_ffmpeg_command(aroll_path, local_broll_paths, project.edit_plan, local_output)
-            process = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+                #Execute Render (single decode, full rendition ladder)
+                hls_dir = os.path.join(tmp_dir, "hls")
+                os.makedirs(hls_dir)
+                await project.set({"status_message": "Executing FFmpeg render engine...", "render_progress": 0.0})
 
-            if process.returncode != 0:
-                raise Exception(f"FFmpeg failed: {process.stderr}")
+                last_report = 0.0
 
-            #Upload Result to MinIO
-            project.status_message = "Uploading final video to cloud..."
-            await project.save()
-            random_suffix = secrets.token_hex(3)
-            minio_path = f"{project_id}/final_master_{random_suffix}.mp4"
-            with open(local_output, "rb") as f:
-                client.put_object(BUCKET_OUTPUTS, minio_path, f, os.path.getsize(local_output))
-
-            project.status = "COMPLETED"
-            project.status_message = "Render successful!"
-            project.final_video_path = minio_path 
-            await project.save()
+                async def report_progress(progress):
+                    nonlocal last_report
+                    # throttle db writes, ffmpeg reports twice a second
+                    if progress["percent"] is None or time.monotonic() - last_report < 2:
+                        return
+                    last_report = time.monotonic()
+                    await project.set({
+                        "render_progress": round(progress["percent"], 1),
+                        "status_message": f"Rendering {progress['percent']:.0f}% at {progress['fps']:.0f} fps"
+                    })
+
+                # segments stream to MinIO while ffmpeg is still encoding the rest
+                encode_finished = asyncio.Event()
+
+                async def pump_segments():
+                    while not encode_finished.is_set():
+                        await _upload_finished_hls_files(hls_dir, hls_prefix, uploaded)
+                        try:
+                            await asyncio.wait_for(encode_finished.wait(), SEGMENT_POLL_SECONDS)
+                        except asyncio.TimeoutError:
+                            pass
+
+                cmd = build_hls_command(aroll_path, local_broll_paths, project.edit_plan, hls_dir)
+                cancel_event = asyncio.Event()
+                cancel_watcher = asyncio.create_task(_watch_cancel(project_id, cancel_event))
+                uploader = asyncio.create_task(pump_segments())
+                ffmpeg_started = time.perf_counter()
+                try:
+                    with span("rendering", "ffmpeg"):
+                        await run_ffmpeg(
+                            cmd,
+                            duration=project.a_roll.duration,
+                            on_progress=report_progress,
+                            timeout=RENDER_TIMEOUT_SECONDS,
+                            cancel_event=cancel_event
+                        )
+                finally:
+                    encode_finished.set()
+                    cancel_watcher.cancel()
+                    # the final pass below retries anything it missed; never mask the ffmpeg error
+                    try:
+                        await uploader
+                    except Exception as e:
+                        print(f"segment upload during render failed: {e}")
+                observe_realtime_factor("render", project.a_roll.duration, time.perf_counter() - ffmpeg_started)
+
+                #Upload the remaining segments, init files and playlists
+                await project.set({"status_message": "Uploading streams to cloud..."})
+                with span("rendering", "upload"):
+                    await _upload_finished_hls_files(hls_dir, hls_prefix, uploaded, final=True)
+
+                await project.set({
+                    "render_progress": 100.0,
+                    "cancel_requested": False,
+                    "status": "COMPLETED",
+                    "status_message": "Render successful!",
+                    "hls_prefix": hls_prefix,
+                    "renditions": [r["name"] for r in RENDITIONS],
+                    "final_video_path": f"{hls_prefix}/{MASTER_PLAYLIST}"
+                })
 
     except Exception as e:
         print(f"Render Task Failed: {str(e)}")
-        project.status = "FAILED"
-        project.status_message = f"Render Error: {str(e)}"
-        await project.save()
\ No newline at end of file
+        try:
+            await asyncio.to_thread(_remove_files, hls_prefix, uploaded)
+        except Exception as cleanup_error:
+            print(f"failed to remove partial render {hls_prefix}: {cleanup_error}")
+        await project.set({
+            "status": "FAILED",
+            "status_message": f"Render Error: {str(e)}",
+            "cancel_requested": False
+        })
\ No newline at end of file
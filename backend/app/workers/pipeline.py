@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pymongo.errors import DuplicateKeyError
+from app.models.project import Project
+from app.models.pipeline import PipelineClaim
+from app.services.transcriber import transcribe_video
+from app.services.brollanalyzer import analyze_broll
+from app.services.matcher import generate_edit_plan
+from app.workers.background import run_video_render
+from app.utils.metrics import span, track_job
+
+# renders are cpu bound; queueing them lets other projects' stages run alongside
+RENDER_SLOTS = asyncio.Semaphore(int(os.getenv("CUESENSE_RENDER_CONCURRENCY", "1")))
+
+# the graph lives in mongo, so any api worker can advance a project and a restart resumes it:
+# finished nodes are read off the project document, running ones hold a claim with a heartbeat
+LEASE_SECONDS = int(os.getenv("CUESENSE_PIPELINE_LEASE", "60"))
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+FINISHED_STATUSES = ["COMPLETED", "FAILED"]
+OWNER = uuid.uuid4().hex
+
+_tasks = set()
+
+async def _set_status(project_id: str, status: str, message: str = ""):
+    await Project.find_one(Project.project_id == project_id).update(
+        {"$set": {"status": status, "status_message": message}}
+    )
+
+# node actions, each writes only its own fields so concurrent nodes never clobber each other
+async def transcribe_node(project_id: str):
+    project = await Project.find_one(Project.project_id == project_id)
+    with track_job("TRANSCRIBING"), span("transcription"):
+        segments = await transcribe_video(project.a_roll.file_id)
+    await Project.find_one(Project.project_id == project_id).update(
+        {"$set": {"a_roll.transcript": segments}}
+    )
+
+def analyze_node(broll_id: str):
+    async def action(project_id: str):
+        with track_job("ANALYZING_BROLL"), span("analysis"):
+            analysis = await analyze_broll(broll_id)
+        await Project.find_one({"project_id": project_id, "b_rolls.broll_id": broll_id}).update(
+            {"$set": {
+                # never leave it unset, an unset description reads as "not analyzed yet"
+                "b_rolls.$.description": analysis.get("description") or "analysis failed",
+                "b_rolls.$.keywords": analysis.get("keywords", []),
+                "b_rolls.$.mood": analysis.get("mood", "neutral"),
+            }}
+        )
+    return action
+
+async def match_node(project_id: str):
+    await _set_status(project_id, "MATCHING_CLIPS", "Matching analyzed clips to the transcript...")
+    with track_job("MATCHING_CLIPS"), span("matching"):
+        edit_plan = await generate_edit_plan(project_id)
+    if not isinstance(edit_plan, list) or not edit_plan:
+        raise Exception("no usable edit plan was generated")
+
+async def render_node(project_id: str):
+    await _set_status(project_id, "RENDER_QUEUED", "Waiting for a free render slot...")
+    async with RENDER_SLOTS:
+        await run_video_render(project_id)
+    project = await Project.find_one(Project.project_id == project_id)
+    if project.status != "COMPLETED":
+        raise Exception(project.status_message or "render did not complete")
+
+
+def _graph(project: Project):
+    """
+    Task graph for one auto-pipeline project, as {name: (action, deps)}, plus the
+    nodes whose output is already on the document. Matching waits for the
+    transcript and every analyzed clip; rendering waits for the plan.
+    """
+    nodes, done = {}, set()
+    if project.a_roll:
+        nodes["transcribe"] = (transcribe_node, set())
+        if project.a_roll.transcript is not None:
+            done.add("transcribe")
+
+    for b in project.b_rolls:
+        name = f"analyze:{b.broll_id}"
+        nodes[name] = (analyze_node(b.broll_id), set())
+        if b.description not in [None, "No description available"]:
+            done.add(name)
+
+    analyze_nodes = {name for name in nodes if name.startswith("analyze:")}
+    if "transcribe" in nodes and analyze_nodes:
+        nodes["match"] = (match_node, {"transcribe"} | analyze_nodes)
+        nodes["render"] = (render_node, {"match"})
+    if project.edit_plan:
+        done.add("match")
+    if project.status == "COMPLETED":
+        done.add("render")
+    return nodes, done
+
+async def _claim(project_id: str, node: str) -> bool:
+    now = time.time()
+    try:
+        await PipelineClaim(project_id=project_id, node=node, owner=OWNER, heartbeat=now).insert()
+        return True
+    except DuplicateKeyError:
+        pass
+    # take over a claim whose worker stopped heartbeating (crashed or restarted)
+    result = await PipelineClaim.find_one(
+        {"project_id": project_id, "node": node, "heartbeat": {"$lt": now - LEASE_SECONDS}}
+    ).update({"$set": {"owner": OWNER, "heartbeat": now}})
+    return bool(result and result.modified_count)
+
+async def _release(project_id: str, node: str):
+    await PipelineClaim.find_one({"project_id": project_id, "node": node, "owner": OWNER}).delete()
+
+async def _heartbeat(project_id: str, node: str):
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            await PipelineClaim.find_one({"project_id": project_id, "node": node, "owner": OWNER}).update(
+                {"$set": {"heartbeat": time.time()}}
+            )
+        except Exception as e:
+            print(f"heartbeat for {project_id} {node} failed: {e}")
+
+async def _run(project_id: str, name: str, action):
+    heartbeat = asyncio.create_task(_heartbeat(project_id, name))
+    try:
+        await action(project_id)
+    except Exception as e:
+        print(f"auto pipeline node {name} failed for {project_id}: {e}")
+        await _set_status(project_id, "FAILED", f"{name} failed: {e}")
+        return
+    finally:
+        heartbeat.cancel()
+        await _release(project_id, name)
+    await advance(project_id)
+
+async def _publish_status(project: Project, nodes: dict, done: set, running: set):
+    # match and render report their own progress
+    if running & {"match", "render"}:
+        return
+
+    analyze_nodes = {name for name in nodes if name.startswith("analyze:")}
+    analyzed = len(analyze_nodes & done)
+    transcript = "ready" if "transcribe" in done else (
+        "in progress" if "transcribe" in running else "waiting for a-roll"
+    )
+    message = f"{analyzed}/{len(analyze_nodes)} clips analyzed, transcript {transcript}"
+
+    if "match" in done:
+        status = "PLAN_READY"
+    elif "transcribe" in running:
+        status = "TRANSCRIBING"
+    elif analyze_nodes & running:
+        status = "ANALYZING_BROLL"
+    elif "transcribe" in done and analyze_nodes and analyze_nodes <= done:
+        status = "BROLL_ANALYZED"
+    elif "transcribe" in done:
+        status = "TRANSCRIPTION_COMPLETE"
+    else:
+        status = "DRAFT"
+    # sweeps re-evaluate idle projects on every worker, only write what actually changed
+    if (status, message) != (project.status, project.status_message):
+        await _set_status(project.project_id, status, message)
+
+async def advance(project_id: str):
+    """
+    Starts every node whose inputs are ready and that no live worker has claimed.
+    Called after each upload and each finished node, from whichever worker saw it.
+    """
+    # claims before the project: a node stores its output before releasing its claim,
+    # so in this order a node finishing in between still shows up as running or done
+    claims = await PipelineClaim.find(PipelineClaim.project_id == project_id).to_list()
+    project = await Project.find_one(Project.project_id == project_id)
+    if not project or not project.auto_pipeline or project.status in FINISHED_STATUSES:
+        return
+
+    nodes, done = _graph(project)
+    now = time.time()
+    running = {c.node for c in claims if now - c.heartbeat < LEASE_SECONDS}
+    uploading = any(name.startswith("upload:") for name in running)
+
+    for name, (action, deps) in nodes.items():
+        if name in done or name in running or not deps <= done:
+            continue
+        if name == "match" and uploading:
+            continue
+        if not await _claim(project_id, name):
+            continue
+        # a stale claim taken over may belong to a node that finished after all
+        _, done_now = _graph(await Project.find_one(Project.project_id == project_id))
+        if name in done_now:
+            await _release(project_id, name)
+            continue
+        running.add(name)
+        task = asyncio.create_task(_run(project_id, name, action))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+    await _publish_status(project, nodes, done, running)
+
+@asynccontextmanager
+async def broll_batch(project_id: str):
+    """holds matching back, on every worker, until each file of a b-roll request is stored."""
+    name = f"upload:{uuid.uuid4().hex[:8]}"
+    await _claim(project_id, name)
+    heartbeat = asyncio.create_task(_heartbeat(project_id, name))
+    try:
+        yield
+    finally:
+        heartbeat.cancel()
+        await _release(project_id, name)
+        await advance(project_id)
+
+async def resume_pipelines():
+    """
+    Re-evaluates unfinished auto projects every lease period, so projects left
+    behind by a restart, or by a worker that died mid-node, carry on.
+    """
+    while True:
+        try:
+            projects = await Project.find(
+                {"auto_pipeline": True, "status": {"$nin": FINISHED_STATUSES}}
+            ).to_list()
+            for project in projects:
+                await advance(project.project_id)
+        except Exception as e:
+            print(f"auto pipeline sweep failed: {e}")
+        await asyncio.sleep(LEASE_SECONDS)
@@ -0,0 +1,260 @@
+"""
+Speed/quality comparison of the cpu inference backends for Whisper and the planner embedder.
+
+Run from the backend directory:
+
+    python -m benchmarks.inference
+    python -m benchmarks.inference --audio-dir path/to/testset
+    python -m benchmarks.inference --whisper-configs base:float32,base:int8,small:int8 \\
+        --embedder-backends torch,torch-int8,onnx,onnx-int8
+
+The Whisper test set is a directory of audio/video files. A sibling .txt holding
+the reference transcript (e.g. talk.mp4 + talk.txt) gives word error rate against
+ground truth; without one, WER is measured against the first (reference) config.
+The default set (benchmarks/testset) is five short public-domain read-speech
+clips with their transcripts, committed so every run scores the same audio.
+The embedder uses a fixed built-in set of transcript phrases and b-roll
+descriptions; match agreement is measured against the first backend.
+
+Each config runs in a fresh process so load time and peak RSS are not shared.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import time
+from datetime import datetime, timezone
+
+from benchmarks.pipeline import PeakRSS, percentile, FILLER_PHRASES
+from benchmarks.standins import SCENES
+
+MEDIA_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".mp4", ".mov", ".mkv"}
+
+TESTSET_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "testset"))
+
+EXTRA_PHRASES = [
+    "we closed the quarter with the whole team in the office",
+    "the first sip of espresso is the best part of the day",
+    "training for the marathon means early runs through the city",
+    "fresh ingredients make all the difference in the kitchen",
+    "every product starts as a rough sketch",
+    "nothing beats celebrating a launch together",
+]
+
+
+# whisper writes the abbreviation, reference transcripts often spell it out
+ABBREVIATIONS = {"mr": "mister", "mrs": "missus", "dr": "doctor", "st": "saint"}
+
+
+def normalize_words(text):
+    words = re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+    return [ABBREVIATIONS.get(word, word) for word in words]
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _bench_whisper(model_size, compute_type, files, repeats):
+    from app.utils.registry import build_whisper_model
+
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        model = build_whisper_model(model_size, compute_type)
+        load_s = time.perf_counter() - started
+
+        texts, walls, audio_s = {}, [], 0.0
+        for path in files:
+            for _ in range(repeats):
+                started = time.perf_counter()
+                segments, info = model.transcribe(path, task="translate", vad_filter=True)
+                text = " ".join(s.text.strip() for s in segments)
+                walls.append(time.perf_counter() - started)
+            texts[os.path.basename(path)] = text
+            audio_s += info.duration
+
+    total_wall = sum(walls) / repeats
+    return {
+        "load_s": round(load_s, 3),
+        "audio_s": round(audio_s, 2),
+        "wall_s": round(total_wall, 3),
+        "realtime_factor": round(total_wall / audio_s, 4) if audio_s else None,
+        "audio_s_per_s": round(audio_s / total_wall, 2) if total_wall else None,
+        "p50_file_s": round(percentile(walls, 50), 3),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "texts": texts,
+    }
+
+
+def _embedder_testset():
+    phrases = FILLER_PHRASES + EXTRA_PHRASES
+    library = [
+        {"id": f"broll_{i}", "description": description, "duration": 5.0}
+        for i, (description, _, _) in enumerate(SCENES)
+    ]
+    transcript = [
+        {"start": float(i * 3), "end": float(i * 3 + 3), "text": text}
+        for i, text in enumerate(phrases)
+    ]
+    return phrases, library, transcript
+
+
+def _bench_embedder(backend, repeats):
+    from app.utils import registry
+    from app.services.planner import SmartPlanner
+
+    phrases, library, transcript = _embedder_testset()
+    descriptions = [b["description"] for b in library]
+
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        model = registry.build_embedder(backend)
+        load_s = time.perf_counter() - started
+        registry.override("embedder", model)
+        planner = SmartPlanner()
+
+        walls = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            scores = planner.score_matrix(phrases, descriptions)
+            walls.append(time.perf_counter() - started)
+        plan = planner.generate_plan(transcript, library)
+
+    rows = scores.tolist()
+    mean = sum(walls) / len(walls)
+    return {
+        "load_s": round(load_s, 3),
+        "p50_batch_s": round(percentile(walls, 50), 4),
+        "sentences_per_s": round((len(phrases) + len(descriptions)) / mean, 1) if mean else None,
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "best_match": [max(range(len(row)), key=row.__getitem__) for row in rows],
+        "scores": rows,
+        "plan": [(p["broll_id"], p["start_sec"]) for p in plan],
+    }
+
+
+def _isolated(fn, *args):
+    # spawn, so every config starts from a clean interpreter
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def run_whisper(configs, audio_dir, repeats, isolate):
+    files = sorted(
+        os.path.join(audio_dir, name) for name in os.listdir(audio_dir)
+        if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS
+    ) if audio_dir and os.path.isdir(audio_dir) else []
+    if not files:
+        print(f"no audio in {audio_dir!r}, skipping whisper")
+        return []
+
+    references = {}
+    for path in files:
+        txt = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(txt):
+            with open(txt) as f:
+                references[os.path.basename(path)] = f.read()
+
+    results = []
+    for config in configs:
+        model_size, _, compute_type = config.partition(":")
+        print(f"whisper {model_size} {compute_type}")
+        run = _isolated(_bench_whisper, model_size, compute_type, files, repeats) if isolate \
+            else _bench_whisper(model_size, compute_type, files, repeats)
+        results.append({"config": config, **run})
+
+    # wer against ground truth where there is one, otherwise against the reference config
+    baseline_texts = results[0]["texts"]
+    for result in results:
+        result["wer_per_file"] = {
+            name: {
+                "wer": round(word_error_rate(references.get(name, baseline_texts[name]), text), 4),
+                "reference": "ground_truth" if name in references else results[0]["config"],
+            }
+            for name, text in result["texts"].items()
+        }
+        errors = [f["wer"] for f in result["wer_per_file"].values()]
+        result["wer"] = round(sum(errors) / len(errors), 4)
+    return results
+
+
+def run_embedder(backends, repeats, isolate):
+    results = []
+    for backend in backends:
+        print(f"embedder {backend}")
+        run = _isolated(_bench_embedder, backend, repeats) if isolate else _bench_embedder(backend, repeats)
+        results.append({"backend": backend, **run})
+
+    reference = results[0]
+    for result in results:
+        agree = sum(a == b for a, b in zip(result["best_match"], reference["best_match"]))
+        result["match_agreement"] = round(agree / len(reference["best_match"]), 4)
+        result["plan_matches_reference"] = result["plan"] == reference["plan"]
+        result["max_score_delta"] = round(max(
+            abs(a - b)
+            for row, ref_row in zip(result["scores"], reference["scores"])
+            for a, b in zip(row, ref_row)
+        ), 4)
+        del result["scores"]
+    return results
+
+
+def _list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CueSense cpu inference backend benchmark")
+    parser.add_argument("--audio-dir", default=TESTSET_DIR, help="defaults to the committed test set")
+    parser.add_argument("--whisper-configs", type=_list, default=["base:float32", "base:int8_float32", "base:int8"],
+                        help="model_size:compute_type, the first one is the quality reference")
+    parser.add_argument("--embedder-backends", type=_list, default=["torch", "torch-int8", "onnx", "onnx-int8"],
+                        help="the first one is the quality reference")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-isolate", action="store_true", help="run every config in this process")
+    parser.add_argument("--output", default="inference_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    isolate = not args.no_isolate
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "whisper": run_whisper(args.whisper_configs, args.audio_dir, args.repeats, isolate),
+        "embedder": run_embedder(args.embedder_backends, args.repeats, isolate),
+    }
+
+    for r in report["whisper"]:
+        print(f"whisper {r['config']:>20}: rtf {r['realtime_factor']}  wer {r['wer']}  rss {r['peak_rss_mb']}MB")
+    for r in report["embedder"]:
+        print(f"embedder {r['backend']:>12}: {r['sentences_per_s']} sent/s  agreement {r['match_agreement']}  "
+              f"rss {r['peak_rss_mb']}MB")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
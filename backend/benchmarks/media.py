@@ -0,0 +1,50 @@
+import os
+import subprocess
+
+# voiced tone gliding around 140hz, ~4 syllables/sec with a pause every 3 seconds
+SPEECH_EXPR = (
+    "(0.35*sin(2*PI*(140+25*sin(2*PI*0.7*t))*t)"
+    "+0.15*sin(4*PI*(140+25*sin(2*PI*0.7*t))*t)"
+    "+0.02*(random(0)-0.5))"
+    "*(0.55+0.45*sin(2*PI*4*t))"
+    "*gt(mod(t,3),0.4)"
+)
+
+BROLL_SOURCES = ["mandelbrot", "testsrc", "smptehdbars", "rgbtestsrc", "cellauto", "life"]
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr[-2000:]}")
+
+
+def make_aroll(path: str, seconds: float, width: int = 720, height: int = 1280):
+    """vertical talking-head stand-in: moving test pattern plus speech-like audio."""
+    if os.path.exists(path):
+        return path
+    _run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30",
+        "-f", "lavfi", "-i", f"aevalsrc='{SPEECH_EXPR}':sample_rate=16000",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        path
+    ])
+    return path
+
+
+def make_broll(path: str, index: int, seconds: float = 5.0):
+    """landscape clip so the renderer's scale/crop path is exercised."""
+    if os.path.exists(path):
+        return path
+    source = BROLL_SOURCES[index % len(BROLL_SOURCES)]
+    _run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"{source}=size=1280x720:rate=30",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        path
+    ])
+    return path
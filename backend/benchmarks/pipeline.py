@@ -0,0 +1,386 @@
+"""
+End-to-end pipeline benchmark with local stand-ins for MinIO, Mongo and Gemini.
+
+Run from the backend directory:
+
+    python -m benchmarks.pipeline --lengths 15,60 --library-sizes 3,8 --repeats 3
+    python -m benchmarks.pipeline --baseline bench_results.json --output new.json
+
+Synthetic media is generated with ffmpeg lavfi sources. Whisper, the sentence
+embedder and ffmpeg run for real; only the network services are replaced.
+Uploads go through the real api endpoints over an in-process asgi transport.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.media import make_aroll, make_broll
+from benchmarks.standins import FakeGemini, InMemoryStorage, install_gemini, install_storage
+
+STAGES = ["upload", "transcription", "analysis", "matching", "planning", "rendering"]
+
+FILLER_PHRASES = [
+    "I start every morning with a cup of coffee",
+    "then I open my laptop and plan the day",
+    "our team meets around the table to share ideas",
+    "after work I go for a run across the bridge",
+    "cooking dinner is how I switch off",
+    "and I sketch new designs in my notebook",
+]
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is kilobytes on linux, bytes on macos
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """samples resident memory on a thread while the block runs."""
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes())
+
+
+class ResponseTimer:
+    """
+    Wraps the asgi app and notes when the last response byte is sent. The
+    in-process transport only returns once background tasks have finished too,
+    so this is what separates request latency from the work it kicked off.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.sent_at = None
+
+    async def __call__(self, scope, receive, send):
+        async def timed_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                self.sent_at = time.perf_counter()
+
+        await self.app(scope, receive, timed_send)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples):
+    latencies = [s["seconds"] for s in samples]
+    units = samples[0]["units"] if samples else 0
+    mean = sum(latencies) / len(latencies)
+    return {
+        "runs": len(latencies),
+        "latency_s": {
+            "mean": round(mean, 4),
+            "min": round(min(latencies), 4),
+            "p50": round(percentile(latencies, 50), 4),
+            "p90": round(percentile(latencies, 90), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4),
+        },
+        "throughput": {
+            "unit": samples[0]["unit"],
+            "per_second": round(units / mean, 4) if mean else None,
+        },
+        "peak_rss_mb": round(max(s["peak_rss"] for s in samples) / 2**20, 1),
+    }
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.workdir = args.workdir or os.path.join(tempfile.gettempdir(), "cuesense-bench")
+        os.makedirs(self.workdir, exist_ok=True)
+        self.storage = InMemoryStorage()
+        self.gemini = FakeGemini(latency=args.gemini_latency)
+        self.startup = {}
+
+    async def setup(self):
+        install_storage(self.storage)
+
+        started = time.perf_counter()
+        from app.models.project import Project
+        from app.services.planner import SmartPlanner
+        from app.utils import registry
+        from app.main import app
+        from app.workers import background
+        self.startup["import_app_s"] = round(time.perf_counter() - started, 4)
+
+        install_gemini(self.gemini)
+
+        # load models up front so the first transcription/planning sample isn't a cold start
+        started = time.perf_counter()
+        registry.warmup(["whisper", "embedder"])
+        self.startup["model_warmup_s"] = round(time.perf_counter() - started, 4)
+
+        from beanie import init_beanie
+        if self.args.mongo_url:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            db_client = AsyncIOMotorClient(self.args.mongo_url)
+        else:
+            from mongomock_motor import AsyncMongoMockClient
+            db_client = AsyncMongoMockClient()
+        await init_beanie(database=db_client["cuesense_bench"], document_models=[Project])
+
+        started = time.perf_counter()
+        self.planner = SmartPlanner()
+        self.startup["planner_init_s"] = round(time.perf_counter() - started, 4)
+
+        self.Project = Project
+        self.background = background
+        # lifespan is not run: beanie, buckets and models are set up above
+        self.timer = ResponseTimer(app)
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.timer), base_url="http://bench", timeout=None)
+
+    def _media(self, video_seconds, library_size):
+        aroll = make_aroll(os.path.join(self.workdir, f"aroll_{video_seconds}s.mp4"), video_seconds)
+        brolls = [
+            make_broll(os.path.join(self.workdir, f"broll_{i}.mp4"), i)
+            for i in range(library_size)
+        ]
+        return aroll, brolls
+
+    async def _stage(self, samples, name, unit, units, coro):
+        with PeakRSS() as rss:
+            started = time.perf_counter()
+            await coro
+            seconds = time.perf_counter() - started
+        samples[name].append({"seconds": seconds, "unit": unit, "units": units, "peak_rss": rss.peak})
+
+    async def _post(self, url, **kwargs):
+        response = await self.http.post(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def run_once(self, samples, video_seconds, library_size):
+        aroll_path, broll_paths = self._media(video_seconds, library_size)
+
+        created = await self._post("/create-project", params={"name": f"bench {video_seconds}s x{library_size}"})
+        project_id = created["project_id"]
+        total_bytes = sum(os.path.getsize(p) for p in [aroll_path] + broll_paths)
+
+        # the a-roll request runs transcription as a background task before the transport returns,
+        # so upload is timed to the response and transcription from there to the end of the task
+        with PeakRSS() as rss:
+            started = time.perf_counter()
+            handles = [open(p, "rb") for p in broll_paths]
+            try:
+                await self._post(
+                    "/b-roll", params={"project_id": project_id},
+                    files=[("files", (os.path.basename(p), f, "video/mp4")) for p, f in zip(broll_paths, handles)]
+                )
+            finally:
+                for f in handles:
+                    f.close()
+            with open(aroll_path, "rb") as f:
+                await self._post(
+                    "/a-roll", params={"project_id": project_id},
+                    files={"file": (os.path.basename(aroll_path), f, "video/mp4")}
+                )
+            finished = time.perf_counter()
+        samples["upload"].append({
+            "seconds": self.timer.sent_at - started, "unit": "MB", "units": total_bytes / 2**20, "peak_rss": rss.peak
+        })
+        samples["transcription"].append({
+            "seconds": finished - self.timer.sent_at, "unit": "media_s", "units": video_seconds, "peak_rss": rss.peak
+        })
+
+        project = await self.Project.find_one(self.Project.project_id == project_id)
+        if len(project.b_rolls) != library_size or not project.a_roll:
+            raise RuntimeError(f"upload incomplete for {project_id}")
+
+        # tones rarely yield words; seed a transcript so matching and planning get real input
+        if project.status == "FAILED":
+            raise RuntimeError(f"transcription failed for {project_id}")
+        if not project.a_roll.transcript:
+            project.a_roll.transcript = [
+                {"start": float(t), "end": float(t + 3), "text": FILLER_PHRASES[(t // 3) % len(FILLER_PHRASES)]}
+                for t in range(0, int(video_seconds) - 2, 3)
+            ]
+            await project.save()
+
+        await self._stage(
+            samples, "analysis", "clips", library_size,
+            self.background.run_broll_analysis(project_id)
+        )
+
+        await self._stage(
+            samples, "matching", "segments", len(project.a_roll.transcript),
+            self.background.run_matching_logic(project_id)
+        )
+
+        project = await self.Project.find_one(self.Project.project_id == project_id)
+        if project.status != "PLAN_READY":
+            raise RuntimeError(f"matching did not produce a plan for {project_id} (status {project.status})")
+
+        library = [{"id": b.broll_id, "description": b.description, "duration": b.duration} for b in project.b_rolls]
+
+        async def planning():
+            self.planner.generate_plan(project.a_roll.transcript, library)
+
+        await self._stage(samples, "planning", "segments", len(project.a_roll.transcript), planning())
+
+        project.status = "RENDERING"
+        await project.save()
+        await self._stage(
+            samples, "rendering", "media_s", video_seconds,
+            self.background.run_video_render(project_id)
+        )
+
+        project = await self.Project.find_one(self.Project.project_id == project_id)
+        if project.status != "COMPLETED":
+            raise RuntimeError(f"render failed for {project_id}: {project.status_message}")
+
+    async def run(self):
+        await self.setup()
+        results = []
+        try:
+            for video_seconds in self.args.lengths:
+                for library_size in self.args.library_sizes:
+                    print(f"scenario: {video_seconds}s a-roll, {library_size} b-rolls")
+                    samples = {stage: [] for stage in STAGES}
+                    for _ in range(self.args.repeats):
+                        await self.run_once(samples, video_seconds, library_size)
+                    results.append({
+                        "video_seconds": video_seconds,
+                        "library_size": library_size,
+                        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+                    })
+        finally:
+            await self.http.aclose()
+        return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline, threshold):
+    """returns every stage whose p50 latency grew by more than threshold over the baseline."""
+    previous = {
+        (r["video_seconds"], r["library_size"], stage): summary
+        for r in baseline["results"] for stage, summary in r["stages"].items()
+    }
+    regressions = []
+    for r in report["results"]:
+        for stage, summary in r["stages"].items():
+            old = previous.get((r["video_seconds"], r["library_size"], stage))
+            if not old or not old["latency_s"]["p50"]:
+                continue
+            ratio = summary["latency_s"]["p50"] / old["latency_s"]["p50"]
+            if ratio > 1 + threshold:
+                regressions.append({
+                    "video_seconds": r["video_seconds"],
+                    "library_size": r["library_size"],
+                    "stage": stage,
+                    "baseline_p50_s": old["latency_s"]["p50"],
+                    "p50_s": summary["latency_s"]["p50"],
+                    "ratio": round(ratio, 3),
+                })
+    return regressions
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CueSense end-to-end pipeline benchmark")
+    parser.add_argument("--lengths", type=_int_list, default=[15, 60], help="a-roll lengths in seconds")
+    parser.add_argument("--library-sizes", type=_int_list, default=[3, 8], help="b-roll library sizes")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="simulated seconds per gemini call")
+    parser.add_argument("--mongo-url", default=None, help="use a real mongo instead of mongomock")
+    parser.add_argument("--workdir", default=None, help="where synthetic media is cached")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="previous results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown before flagging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    harness = Harness(args)
+    results = asyncio.run(harness.run())
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "lengths": args.lengths,
+            "library_sizes": args.library_sizes,
+            "repeats": args.repeats,
+            "gemini_latency": args.gemini_latency,
+        },
+        "startup": harness.startup,
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "storage_bytes_written": harness.storage.bytes_written,
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['stage']} ({r['video_seconds']}s x{r['library_size']}): "
+                  f"{r['baseline_p50_s']}s -> {r['p50_s']}s")
+        exit_code = 1 if report["regressions"] else 0
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
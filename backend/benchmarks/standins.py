@@ -0,0 +1,176 @@
+import io
+import json
+import os
+import re
+import sys
+import time
+import types
+import zlib
+from types import SimpleNamespace
+
+BUCKET_A_ROLL = "a-roll"
+BUCKET_B_ROLL = "b-roll"
+BUCKET_OUTPUTS = "output"
+
+
+class _StoredObject:
+    """mimics the urllib3 response returned by Minio.get_object."""
+    def __init__(self, data: bytes):
+        self._buf = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._buf.read() if amt is None else self._buf.read(amt)
+
+    def stream(self, amt=64 * 1024):
+        while True:
+            chunk = self._buf.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class InMemoryStorage:
+    """in-process stand-in for the MinIO client, keeps every object in a dict."""
+    def __init__(self):
+        self.buckets = {}
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def bucket_exists(self, bucket):
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket):
+        self.buckets.setdefault(bucket, {})
+
+    def put_object(self, bucket, name, data, length, content_type="application/octet-stream", **kwargs):
+        payload = data.read() if length < 0 else data.read(length)
+        self.buckets.setdefault(bucket, {})[name] = payload
+        self.bytes_written += len(payload)
+
+    def get_object(self, bucket, name, **kwargs):
+        try:
+            payload = self.buckets[bucket][name]
+        except KeyError:
+            raise FileNotFoundError(f"no such object: {bucket}/{name}")
+        self.bytes_read += len(payload)
+        return _StoredObject(payload)
+
+    def stat_object(self, bucket, name, **kwargs):
+        try:
+            return SimpleNamespace(size=len(self.buckets[bucket][name]))
+        except KeyError:
+            raise FileNotFoundError(f"no such object: {bucket}/{name}")
+
+    def remove_object(self, bucket, name, **kwargs):
+        self.buckets.get(bucket, {}).pop(name, None)
+
+    def presigned_get_object(self, bucket, name, **kwargs):
+        return f"memory://{bucket}/{name}"
+
+
+def install_storage(storage):
+    """
+    Registers the stand-in as app.utils.storage before any app module imports it,
+    so every `from app.utils.storage import client` binds to the in-memory store.
+    """
+    module = types.ModuleType("app.utils.storage")
+    module.BUCKET_A_ROLL = BUCKET_A_ROLL
+    module.BUCKET_B_ROLL = BUCKET_B_ROLL
+    module.BUCKET_OUTPUTS = BUCKET_OUTPUTS
+    module.client = storage
+
+    async def ensure_buckets():
+        pass
+
+    module.ensure_buckets = ensure_buckets
+    for bucket in [BUCKET_A_ROLL, BUCKET_B_ROLL, BUCKET_OUTPUTS]:
+        storage.make_bucket(bucket)
+    sys.modules["app.utils.storage"] = module
+
+
+SCENES = [
+    ("a person typing on a laptop in a bright office", ["laptop", "typing", "office", "work", "desk"], "professional"),
+    ("a barista pouring latte art into a ceramic cup", ["coffee", "cafe", "barista", "morning", "cup"], "calm"),
+    ("runners crossing a city bridge at sunrise", ["running", "fitness", "city", "sunrise", "bridge"], "energetic"),
+    ("a chef chopping vegetables in a busy kitchen", ["cooking", "kitchen", "chef", "vegetables", "food"], "energetic"),
+    ("a close-up of hands sketching on a notebook", ["drawing", "notebook", "idea", "design", "hands"], "calm"),
+    ("a team celebrating around a conference table", ["team", "meeting", "success", "office", "celebration"], "energetic"),
+]
+
+
+class FakeGemini:
+    """
+    Stands in for the slice of google.generativeai used by the analyzer and matcher.
+    Responses are deterministic; latency simulates the blocking API round-trip.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    # module-level genai surface
+    def configure(self, **kwargs):
+        pass
+
+    def upload_file(self, path):
+        return SimpleNamespace(name=f"files/{os.path.basename(path)}", state=SimpleNamespace(name="ACTIVE"))
+
+    def get_file(self, name):
+        return SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+
+    def delete_file(self, name):
+        pass
+
+    def GenerativeModel(self, model_name):
+        return self
+
+    # model surface
+    def generate_content(self, contents, generation_config=None):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+
+        # the analyzer sends [prompt, video_file], the matcher a single prompt
+        if isinstance(contents, list):
+            return SimpleNamespace(text=json.dumps(self._describe(contents[1].name)))
+        return SimpleNamespace(text=json.dumps(self._plan(contents)))
+
+    def _describe(self, file_name):
+        description, keywords, mood = SCENES[zlib.crc32(file_name.encode()) % len(SCENES)]
+        return {"description": description, "keywords": keywords, "mood": mood}
+
+    def _plan(self, prompt):
+        transcript = json.loads(re.search(r"Transcript: (\[.*\])", prompt).group(1))
+        inventory = json.loads(re.search(r"B-Roll Inventory: (\[.*\])", prompt).group(1))
+        if not inventory:
+            return []
+
+        plan = []
+        next_slot = 0.0
+        for segment in transcript:
+            if segment["start"] < next_slot:
+                continue
+            clip = inventory[len(plan) % len(inventory)]
+            duration = round(min(3.0, clip["duration"], segment["end"] - segment["start"]), 2)
+            if duration <= 0:
+                continue
+            plan.append({
+                "broll_id": clip["id"],
+                "start_in_aroll": segment["start"],
+                "duration": duration,
+                "reason": f"matches '{segment['text']}'"
+            })
+            next_slot = segment["start"] + duration + 8.0
+        return plan
+
+
+def install_gemini(gemini):
+    """routes every registry lookup for the genai module and gemini model to the stand-in."""
+    from app.utils import registry
+    registry.override("genai", gemini)
+    registry.override("gemini", gemini)
@@ -5,6 +5,7 @@ import ARollSection from './components/aRollSection';
 import BRollSection from './components/bRollSection';
 import StatusCard from './components/StatusCard';
 import LibraryPage from './components/ProjectHistory';
+import HlsPlayer from './components/HlsPlayer';
 import { useProjectStatus } from './hooks/useProjectStatus';
 
 const API_BASE = "http://localhost:8000";
@@ -141,10 +142,10 @@ export default function App() {
               <div className="space-y-4">
                 <h3 className="text-lg font-bold text-slate-800 ml-2">Final Master Cut</h3>
                 <div className="overflow-hidden rounded-[40px] bg-black shadow-2xl ring-1 ring-slate-200">
-                  <video 
-                    controls 
+                  <HlsPlayer
                     className="w-full h-auto aspect-video"
-                    src={`${API_BASE}/${projectId}/download`}
+                    src={metadata?.renditions?.length ? `${API_BASE}/${projectId}/hls/master.m3u8` : null}
+                    fallbackSrc={`${API_BASE}/${projectId}/download`}
                   />
                 </div>
               </div>
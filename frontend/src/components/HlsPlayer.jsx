@@ -0,0 +1,37 @@
+import { useEffect, useRef } from 'react';
+import Hls from 'hls.js';
+
+// plays the adaptive stream: native hls where the browser has it (safari/ios), hls.js elsewhere
+export default function HlsPlayer({ src, fallbackSrc, className }) {
+  const videoRef = useRef(null);
+
+  useEffect(() => {
+    const video = videoRef.current;
+    if (!video) return;
+
+    // projects rendered before the streaming ladder only have a single mp4
+    if (!src) {
+      video.src = fallbackSrc;
+      return;
+    }
+
+    if (video.canPlayType('application/vnd.apple.mpegurl')) {
+      video.src = src;
+      return;
+    }
+
+    if (!Hls.isSupported()) {
+      video.src = fallbackSrc;
+      return;
+    }
+
+    const hls = new Hls();
+    hls.loadSource(src);
+    hls.attachMedia(video);
+
+    // cleanup: release the media source when the project or stream changes
+    return () => hls.destroy();
+  }, [src, fallbackSrc]);
+
+  return <video ref={videoRef} controls className={className} />;
+}